@@ -8,7 +8,6 @@ Modes:
 
 Dependencies:
   • yt-dlp      (pip install yt-dlp)
-  • pydub       (pip install pydub)
   • mutagen     (pip install mutagen)
   • ffmpeg must be installed and on your PATH
 """
@@ -16,128 +15,336 @@ Dependencies:
 import os
 import re
 import json
-import subprocess
+import atexit
 import logging
-import glob
-import time
-import tempfile
+import logging.handlers
+import threading
+from queue import Queue, Empty, Full
 from mutagen.easyid3 import EasyID3
 from mutagen.mp3 import MP3
-from pydub import AudioSegment
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import MetadataParserPP
+from yt_dlp.utils import DownloadError, download_range_func
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 
 # Configuration
 DOWNLOAD_FOLDER  = os.path.expanduser("~/Downloads/youtube_mp3s")
 DEFAULT_CLIP_LEN = 60  # seconds
+ALBUM_NAME       = "YouTube Batch"  # forced album tag; None keeps yt-dlp's tags as-is
+MAX_WORKERS      = min(8, (os.cpu_count() or 1) * 2)  # parallel videos per batch
+CACHE_PATH       = os.path.join(DOWNLOAD_FOLDER, ".y2b_cache.json")
+YTDLP_CACHE_DIR  = os.path.expanduser("~/.cache/yt-dlp")  # player JS reused across runs
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
+# yt-dlp options that trim per-URL overhead. player_client values change between
+# yt-dlp releases; adjust if extraction starts failing.
+YTDLP_FAST_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "logger": logging.getLogger("yt-dlp"),  # errors land in our log format
+    "cachedir": YTDLP_CACHE_DIR,
+    "extractor_args": {"youtube": {"player_client": ["web_safari"]}},
+}
+
 # Logging
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Helpers
+_YT_RE = re.compile(r'^https?://(www\.)?(youtube\.com|youtu\.be)/')
+_FILE_CLIP_RE = re.compile(r'\[([\w-]{11})\] (\d+)s\.mp3$')
+_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/)([\w-]{11})')
+
 def sanitize_url(raw: str) -> str:
     """Sanitize a YouTube URL by keeping only necessary query parameters."""
     p = urlparse(raw)
-    params = {}
-    if 'v' in parse_qs(p.query):   
-        params['v'] = parse_qs(p.query)['v'][0]
-    if 'list' in parse_qs(p.query): 
-        params['list'] = parse_qs(p.query)['list'][0]
+    q = parse_qs(p.query)
+    params = {k: q[k][0] for k in ('v', 'list') if k in q}
     return urlunparse(p._replace(query=urlencode(params)))
 
 def is_youtube_url(url: str) -> bool:
-    return bool(re.match(r'^https?://(www\.)?(youtube\.com|youtu\.be)/', url))
+    return bool(_YT_RE.match(url))
 
-def run_ytdlp(cmd: list) -> str:
-    logging.info(f"Running: {' '.join(cmd)}")
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        logging.error(f"yt-dlp error: {proc.stderr.strip()}")
-        return None
-    output = proc.stdout.strip().splitlines()
-    if not output:
-        return None
-    filepath = output[-1]
-    if filepath.upper() == 'NA':
-        logging.error("yt-dlp returned 'NA' for filepath.")
-        return None
-    return filepath
+def cache_key(url: str) -> str:
+    """Canonical key for a video: its ID, so watch?v=X and youtu.be/X match."""
+    m = _ID_RE.search(url)
+    return m.group(1) if m else url
+
+def clip_key(video_id: str, length: int) -> str:
+    """Key for one clip of a video: the same video at another length is a different clip."""
+    return f"{video_id} {length}s"
+
+# Cache: clip_key -> {"path"} of finished downloads, kept across runs
+def load_cache() -> dict:
+    try:
+        with open(CACHE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_cache = load_cache()
+_cache_lock = threading.Lock()
+_cache_dirty = False
+
+def cached(key: str) -> dict:
+    """Return the cache entry for a video if its MP3 is still on disk, else None."""
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry and os.path.exists(entry["path"]):
+        return entry
+    return None
+
+def downloaded_clips(folder: str) -> set:
+    """clip_keys of the '<title> [<id>] <length>s.mp3' files in a folder, from one scan."""
+    try:
+        with os.scandir(folder) as it:
+            return {clip_key(m.group(1), int(m.group(2)))
+                    for e in it if (m := _FILE_CLIP_RE.search(e.name))}
+    except OSError:
+        return set()
+
+def already_downloaded(key: str, on_disk: set) -> bool:
+    """True if the clip is cached or its key is in `on_disk` (see downloaded_clips)."""
+    return key in on_disk or bool(cached(key))
+
+def remember(key: str, path: str):
+    """Record a finished download; written to disk by save_cache()."""
+    global _cache_dirty
+    with _cache_lock:
+        _cache[key] = {"path": path}
+        _cache_dirty = True
+
+def save_cache():
+    """Persist the cache atomically if anything changed since the last save."""
+    global _cache_dirty
+    with _cache_lock:
+        if not _cache_dirty:
+            return
+        try:
+            tmp_path = CACHE_PATH + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(_cache, f)
+            os.replace(tmp_path, CACHE_PATH)
+            _cache_dirty = False
+        except OSError as e:
+            logging.error(f"Error saving cache {CACHE_PATH}: {e}")
+
+atexit.register(save_cache)
 
 # Core
-def download_mp3(url: str, output_folder: str) -> str:
+def ydl_download_opts(output_folder: str, length: int) -> dict:
+    """yt-dlp options for one folder and clip length; a fresh dict per YoutubeDL."""
+    # Written straight into the output folder: yt-dlp's own .part -> final
+    # rename stays on one filesystem, so there is no extra copy or move.
+    return {
+        "format": "bestaudio/best",
+        # ID and length in the name let downloaded_clips() find finished clips in one scan
+        "outtmpl": os.path.join(output_folder, f"%(title)s [%(id)s] {length}s.%(ext)s"),
+        "download_ranges": download_range_func(None, [(0, length)]),
+        "postprocessors": [
+            # Embedded tags: title from the video, artist from the uploader
+            {"key": "MetadataParser", "when": "pre_process",
+             "actions": [(MetadataParserPP.Actions.INTERPRET, "uploader", "%(artist)s")]},
+            {"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "0"},
+            {"key": "FFmpegMetadata", "add_metadata": True},
+        ],
+        # Section cuts land on keyframes; bound the MP3 exactly in the same encode
+        "postprocessor_args": {"extractaudio+ffmpeg_o": ["-t", str(length)]},
+        "noplaylist": True,
+        **YTDLP_FAST_OPTS,
+    }
+
+# Single-video downloads (mode 1) reuse one YoutubeDL while folder and length stay the same
+_downloader = None  # ((folder, length), YoutubeDL)
+
+def close_downloader():
+    global _downloader
+    if _downloader is not None:
+        _downloader[1].close()
+        _downloader = None
+
+atexit.register(close_downloader)
+
+def get_downloader(output_folder: str, length: int) -> YoutubeDL:
+    """Return the shared single-video YoutubeDL, rebuilding it if folder or length changed."""
+    global _downloader
+    key = (output_folder, length)
+    if _downloader is None or _downloader[0] != key:
+        close_downloader()
+        _downloader = (key, YoutubeDL(ydl_download_opts(output_folder, length)))
+    return _downloader[1]
+
+def download_with(ydl: YoutubeDL, url: str, length: int):
     """
-    Download the audio stream of a YouTube URL as MP3.
-    Returns the full path to the downloaded file.
+    Download one URL with an open YoutubeDL.
+    Returns (key, path), or None on failure.
     """
-    with tempfile.TemporaryDirectory() as temp_folder:
-        template = os.path.join(temp_folder, "%(title)s.%(ext)s")
-        cmd = [
-            "yt-dlp",
-            "-x",
-            "--audio-format", "mp3",
-            "--audio-quality", "0",
-            "-o", template,
-            url
-        ]
-        logging.info(f"Running: {' '.join(cmd)}")
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        if proc.returncode != 0:
-            logging.error(f"yt-dlp error: {proc.stderr.strip()}")
-            return None
-
-        # Find the downloaded file in the temporary folder
-        candidates = glob.glob(os.path.join(temp_folder, "*.mp3"))
-        if not candidates:
-            logging.error("No MP3 found after download.")
-            return None
-
-        # Move the file to the output folder
-        latest = max(candidates, key=os.path.getmtime)
-        final_path = os.path.join(output_folder, os.path.basename(latest))
-        os.rename(latest, final_path)
-        logging.info(f"Downloaded MP3: {final_path}")
-        return final_path
-
-def trim_and_tag(path: str, title: str, artist: str, length: int):
-    audio = AudioSegment.from_file(path)
-    clipped = audio[: length * 1000]
-    clipped.export(path, format="mp3")
+    try:
+        info = ydl.extract_info(url, download=True)
+    except DownloadError:
+        return None  # yt-dlp has already logged the reason
+    downloads = (info or {}).get("requested_downloads") or []
+    path = downloads[0].get("filepath") if downloads else None
+    if not path or not os.path.exists(path):
+        logging.error("No MP3 found after download.")
+        return None
+    logging.info(f"Downloaded MP3: {path}")
+    return clip_key(info.get("id") or cache_key(url), length), path
+
+def download_mp3(url: str, output_folder: str, length: int):
+    """
+    Download the first `length` seconds of a YouTube URL's audio as MP3.
+    Returns (key, path) for the downloaded file, or None on failure.
+    """
+    return download_with(get_downloader(output_folder, length), url, length)
+
+def tag_mp3(path: str, album: str):
+    """Apply tag overrides on top of the title/artist yt-dlp already embedded."""
     tags = MP3(path, ID3=EasyID3)
-    tags["title"] = title
-    tags["artist"] = artist
-    tags["album"] = "YouTube Batch"
-    tags.save()
-    logging.info(f"Trimmed & tagged: {path}")
+    tags.update({"album": [album]})
+    tags.save(v2_version=3)
+    logging.info(f"Tagged: {path}")
 
-def fetch_metadata(url: str) -> (str, str):
+def fetch_and_download(url: str, length: int):
+    """Download a sanitized URL. Returns (key, path), or None on failure."""
+    logging.info(f"Downloading: {url}")
+    item = download_mp3(url, DOWNLOAD_FOLDER, length)
+    if not item:
+        logging.error(f"Failed to download MP3 for: {url}")
+        return None
+    return item
+
+def tag_and_remember(key: str, path: str):
     try:
-        result = subprocess.run(
-            ["yt-dlp", "--get-title", "--get-uploader", url],
-            capture_output=True, text=True, check=True
-        ).stdout.splitlines()
-        title = result[0] if result else "Unknown Title"
-        artist = result[1] if len(result) > 1 else "Unknown Artist"
-    except Exception:
-        logging.warning("Metadata fetch failed; using defaults.")
-        title, artist = f"Video_{int(time.time())}", "Unknown Artist"  # Use timestamp for uniqueness
-    return title, artist
+        if ALBUM_NAME:
+            tag_mp3(path, ALBUM_NAME)
+        remember(key, path)
+    except Exception as e:
+        logging.error(f"Error tagging/caching {path}: {e}")
 
 def process_video(raw_url: str, length: int):
     url = sanitize_url(raw_url)
     if not is_youtube_url(url):
         logging.warning(f"Skipping invalid URL: {url}")
         return
-    title, artist = fetch_metadata(url)
-    logging.info(f"Downloading: '{title}' by {artist}")
-    mp3_path = download_mp3(url, DOWNLOAD_FOLDER)
-    if not mp3_path or not os.path.exists(mp3_path):
-        logging.error(f"Failed to download MP3 for: {url}")
+    key = clip_key(cache_key(url), length)
+    if already_downloaded(key, downloaded_clips(DOWNLOAD_FOLDER)):
+        logging.info(f"Already downloaded: {url}")
         return
+    item = fetch_and_download(url, length)
+    if item:
+        tag_and_remember(*item)
+        save_cache()
+
+# Pipeline: downloads (network-bound) overlap with tagging (disk-bound)
+def put_while_alive(download_q: Queue, item, downloaders: list) -> bool:
+    """Queue an item for the downloaders; False once none of them is running."""
+    while any(t.is_alive() for t in downloaders):
+        try:
+            download_q.put(item, timeout=1)
+            return True
+        except Full:
+            continue
+    return False
+
+def downloader_worker(download_q: Queue, tag_q: Queue, length: int):
+    # One in-process YoutubeDL per thread: extractors load once, not per URL
     try:
-        trim_and_tag(mp3_path, title, artist, length)
+        ydl = YoutubeDL(ydl_download_opts(DOWNLOAD_FOLDER, length))
     except Exception as e:
-        logging.error(f"Error trimming/tagging {mp3_path}: {e}")
+        # Leave the queue to the healthy workers; process_many notices if none are left
+        logging.error(f"Could not start downloader: {e}")
+        return
+    with ydl:
+        while True:
+            url = download_q.get()
+            if url is None:
+                break
+            try:
+                item = download_with(ydl, url, length)
+            except Exception as e:
+                logging.error(f"Error processing video {url}: {e}")
+                continue
+            if item:
+                tag_q.put(item)
+            else:
+                logging.error(f"Failed to download MP3 for: {url}")
+
+def tagger_worker(tag_q: Queue):
+    while True:
+        item = tag_q.get()
+        if item is None:
+            break
+        tag_and_remember(*item)
+
+def process_many(urls, length: int):
+    """
+    Process an iterable of video URLs through the download -> tag pipeline.
+    MAX_WORKERS downloader threads feed a single tagger thread. `urls` is
+    pulled lazily: the bounded download queue keeps playlist enumeration only
+    a few entries ahead of the downloads, so memory stays flat however long
+    the playlist is.
+    """
+    download_q, tag_q = Queue(maxsize=MAX_WORKERS * 2), Queue()
+    downloaders = [threading.Thread(target=downloader_worker, args=(download_q, tag_q, length))
+                   for _ in range(MAX_WORKERS)]
+    tagger = threading.Thread(target=tagger_worker, args=(tag_q,))
+    for t in downloaders + [tagger]:
+        t.start()
+    seen_ids, on_disk = set(), downloaded_clips(DOWNLOAD_FOLDER)
+    try:
+        for raw_url in urls:
+            url = sanitize_url(raw_url)
+            if not is_youtube_url(url):
+                logging.warning(f"Skipping invalid URL: {url}")
+                continue
+            video_id = cache_key(url)
+            if video_id in seen_ids:
+                continue
+            seen_ids.add(video_id)
+            if already_downloaded(clip_key(video_id, length), on_disk):
+                logging.info(f"Already downloaded: {url}")
+                continue
+            if not put_while_alive(download_q, url, downloaders):
+                logging.error(f"No downloader running; skipping {url} and the rest")
+                break
+    finally:
+        # One sentinel per downloader, then one for the tagger once they drain
+        for _ in downloaders:
+            if not put_while_alive(download_q, None, downloaders):
+                break
+        for t in downloaders:
+            t.join()
+        # Anything still queued was never picked up because every downloader failed
+        while True:
+            try:
+                url = download_q.get_nowait()
+            except Empty:
+                break
+            if url is not None:
+                logging.error(f"Failed to download MP3 for: {url}")
+        tag_q.put(None)
+        tagger.join()
+        save_cache()
+
+def iter_playlist_urls(url: str):
+    """Yield video URLs of a playlist while yt-dlp is still paging through it."""
+    count = 0
+    with YoutubeDL({"extract_flat": "in_playlist", **YTDLP_FAST_OPTS}) as ydl:
+        try:
+            # process=False keeps `entries` a lazy generator instead of a list
+            info = ydl.extract_info(url, download=False, process=False)
+            while info and info.get("_type") in ("url", "url_transparent"):
+                info = ydl.extract_info(info["url"], download=False, process=False)
+            for entry in (info or {}).get("entries") or []:
+                video_id = entry.get("id") if entry else None
+                if not video_id:
+                    continue
+                count += 1
+                yield f"https://www.youtube.com/watch?v={video_id}"
+        except DownloadError:
+            pass  # yt-dlp has already logged the reason
+    logging.info(f"Playlist {url} contains {count} videos")
 
 def process_playlist(raw_url: str, length: int):
     url = sanitize_url(raw_url)
@@ -145,26 +352,12 @@ def process_playlist(raw_url: str, length: int):
         logging.warning(f"Skipping invalid playlist URL: {url}")
         return
     try:
-        data = subprocess.run(
-            ["yt-dlp", "--flat-playlist", "--dump-single-json", url],
-            capture_output=True, text=True, check=True
-        ).stdout
-        pl = json.loads(data)
-        entries = pl.get("entries", [])
-        logging.info(f"Playlist '{pl.get('title','')}' contains {len(entries)} videos")
-        for e in entries:
-            try:
-                vid = f"https://www.youtube.com/watch?v={e['id']}"
-                process_video(vid, length)
-            except Exception as e:
-                logging.error(f"Error processing video {e['id']}: {e}")
+        process_many(iter_playlist_urls(url), length)
     except Exception as e:
         logging.error(f"Error processing playlist {url}: {e}")
 
-def batch_from_file(file_path: str, length: int):
-    if not os.path.isfile(file_path):
-        logging.error(f"Batch file not found: {file_path}")
-        return
+def iter_batch_urls(file_path: str):
+    """Stream valid YouTube URLs from a batch file, one per line; process_many dedupes."""
     with open(file_path, "r") as f:
         for line in f:
             link = line.strip()
@@ -173,13 +366,63 @@ def batch_from_file(file_path: str, length: int):
             if not is_youtube_url(link):
                 logging.warning(f"Skipping invalid URL: {link}")
                 continue
-            if 'list=' in link:
-                process_playlist(link, length)
+            yield link
+
+def batch_from_file(file_path: str, length: int):
+    if not os.path.isfile(file_path):
+        logging.error(f"Batch file not found: {file_path}")
+        return
+
+    def expand():
+        # Playlists are enumerated lazily, so their entries share the one
+        # pipeline with the standalone videos and nothing waits on them.
+        for url in iter_batch_urls(file_path):
+            if 'list=' in url:
+                # A failing playlist must not take the rest of the file down with it
+                try:
+                    yield from iter_playlist_urls(url)
+                except Exception as e:
+                    logging.error(f"Error processing playlist {url}: {e}")
             else:
-                process_video(link, length)
+                yield url
+
+    process_many(expand(), length)
+
+def start_queued_logging():
+    """
+    Route root logging through a QueueHandler so worker threads only enqueue
+    records; a single QueueListener thread formats and writes them.
+    Returns a function that flushes the listener and restores the handlers.
+    """
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    for h in handlers:
+        root.removeHandler(h)
+    log_q = Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_q)
+    root.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(log_q, *handlers, respect_handler_level=True)
+    listener.start()
+
+    def stop():
+        listener.stop()
+        root.removeHandler(queue_handler)
+        for h in handlers:
+            root.addHandler(h)
+    return stop
 
 # Main CLI
 def main():
+    stop_logging = start_queued_logging()
+    try:
+        run_cli()
+    finally:
+        # Exit-time work runs while the listener can still print its logs
+        save_cache()
+        close_downloader()
+        stop_logging()
+
+def run_cli():
     print("YouTube MP3 Batch Tool")
     try:
         clip_len = int(input(f"Clip length seconds (default {DEFAULT_CLIP_LEN}): ").strip())